@@ -21,13 +21,16 @@ Sea-Guardian Backend — Flask API
 """
 
 from __future__ import annotations
-import os, json, math, time, random, datetime as dt
+import os, json, math, time, random, threading, multiprocessing, datetime as dt
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import Dict, Any, List, Tuple, Optional
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 
 import numpy as np
+from scipy.interpolate import interpn
 
 # xarray/NetCDF للبيانات الفعلية (يُستخدم إن توفرت ملفات أو اتصال)
 try:
@@ -35,6 +38,18 @@ try:
 except Exception:
     xr = None
 
+# orjson (اختياري) لترميز JSON أسرع للاستجابات الكبيرة؛ بدونه نستخدم jsonify
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+# Numba (اختياري) لترجمة خطوة الجسيمات JIT؛ بدونه نستخدم مسار numpy
+try:
+    from numba import njit, prange
+except Exception:
+    njit = None
+
 # ========================= إعدادات عامة =========================
 APP_TITLE = "Sea Guardian API"
 DATA_DIR   = os.path.join(os.path.dirname(__file__), "data")
@@ -49,10 +64,27 @@ DEFAULT_PARTICLES = 8000
 # النطاق المكاني (خليج عمان تقريبًا)
 DOMAIN = dict(lat_min=22.5, lat_max=26.0, lon_min=56.5, lon_max=60.5)
 
+# تحويل متر → درجة. cos(lat) يتغيّر أقل من 3% عبر نطاق عرض الدومين،
+# لذا نستخدم قيمته عند منتصف النطاق بدل حسابه لكل جسيم في كل خطوة
+_M_PER_DEG_LAT = 111_000.0
+_INV_MDEGLAT = 1.0/_M_PER_DEG_LAT
+_INV_MDEGLON = 1.0/(_M_PER_DEG_LAT*math.cos(math.radians(0.5*(DOMAIN["lat_min"]+DOMAIN["lat_max"]))))
+
 # زمن خطوة التكامل (ثواني)
 DT_SECONDS = 600.0  # 10 دقائق
-# عدد خطوات السجل الذي نعيده على هيئة Polyline (تجميع)
+# مع الحقول الاصطناعية (بطيئة التغيّر) يكفي RK2 بخطوة أكبر بدقة بضعة كم
+SYNTHETIC_DT_SECONDS = 1800.0  # 30 دقيقة
+# عدد خطوات السجل (بطول DT_SECONDS) الذي نعيده على هيئة Polyline (تجميع)
 SAMPLE_EVERY_STEPS = 3
+# الفاصل الزمني الثابت بين نقاط المسار المتوسط المُعاد (30 دقيقة) أيًا كان dt
+TRACK_SAMPLE_SECONDS = SAMPLE_EVERY_STEPS*DT_SECONDS
+# عدد الخطوات التي نولّد ضوضاء التشتت لها في استدعاء RNG واحد (يحدّ الذاكرة عند n كبير)
+RNG_BLOCK_STEPS = 64
+# توازي مسار numpy (بدون Numba): عدد العمليات (اختياري، الافتراضي 1 = بدون مجمّع عمليات)،
+# وأقل عدد جسيمات لكل عملية. تنبيه: تيار الأرقام العشوائية يعتمد على عدد العمليات،
+# فنفس seed يعطي مسارًا مختلفًا قليلًا عند تغيير SIM_WORKERS
+SIM_WORKERS = int(os.environ.get("SIM_WORKERS", 1))
+MIN_PARTICLES_PER_WORKER = 2000
 
 # ========================= أدوات مساعدة =========================
 def clamp(v, a, b):
@@ -66,6 +98,18 @@ def haversine_km(lat1, lon1, lat2, lon2):
          math.cos(math.radians(lat1))*math.cos(math.radians(lat2))*math.sin(dlon/2)**2)
     return 2*R*math.asin(math.sqrt(a))
 
+def haversine_km_np(lat1, lon1, lat2, lon2):
+    """
+    نسخة متجهية من haversine_km: أي وسيط قد يكون مصفوفة numpy
+    (مثلاً نقطة واحدة مقابل كل الجسيمات أو كل العوامات).
+    """
+    R = 6371.0
+    lat1r, lat2r = np.radians(lat1), np.radians(lat2)
+    dlat = lat2r - lat1r
+    dlon = np.radians(np.subtract(lon2, lon1))
+    a = np.sin(dlat/2)**2 + np.cos(lat1r)*np.cos(lat2r)*np.sin(dlon/2)**2
+    return 2*R*np.arcsin(np.sqrt(a))
+
 def seed_rng(seed=None):
     if seed is None:
         seed = int(time.time()*1000) & 0xffffffff
@@ -133,20 +177,29 @@ class SyntheticFields:
         self.lon_min = domain["lon_min"]
         self.lon_max = domain["lon_max"]
 
-    def uv_current(self, lat, lon, tsec) -> Tuple[float,float]:
+    def uv_current(self, lat, lon, tsec):
         # نمط دوّار بسيط + موجة زمنية خفيفة
         # السرعة بالمتر/ثانية على السطح
+        # lat/lon قد تكون قيمًا مفردة أو مصفوفات numpy (كل الجسيمات دفعة واحدة)
+        # الناتج يحمل نفس dtype المدخلات (float32 لجسيمات المحاكاة)
+        lat = np.asarray(lat); lon = np.asarray(lon)
         # حوّل lat/lon إلى نسب داخل المجال
         ly = (lat - self.lat_min)/(self.lat_max - self.lat_min + 1e-9)
         lx = (lon - self.lon_min)/(self.lon_max - self.lon_min + 1e-9)
         base = 0.25  # m/s
-        u = base*( math.sin(2*math.pi*lx) * math.cos(2*math.pi*ly) ) * (1+0.1*math.sin(2*math.pi*tsec/86400))
-        v = base*( -math.cos(2*math.pi*lx) * math.sin(2*math.pi*ly) ) * (1+0.1*math.cos(2*math.pi*tsec/86400))
+        ft_u = 1+0.1*math.sin(2*math.pi*tsec/86400)
+        ft_v = 1+0.1*math.cos(2*math.pi*tsec/86400)
+        sx, cx = np.sin(2*np.pi*lx), np.cos(2*np.pi*lx)
+        sy, cy = np.sin(2*np.pi*ly), np.cos(2*np.pi*ly)
+        u = base*( sx * cy ) * ft_u
+        v = base*( -cx * sy ) * ft_v
         # اندفاع ساحلي خفيف شرق->غرب
-        u += 0.05*math.cos(2*math.pi*ly)
+        u = u + 0.05*cy
+        if np.ndim(u) == 0:
+            return (float(u), float(v))
         return (u, v)
 
-    def uv_wind10m(self, lat, lon, tsec) -> Tuple[float,float]:
+    def uv_wind10m(self, lat, lon, tsec):
         # رياح جنوبية-شرقية ثابتة تقريبًا + تذبذب يومي
         speed = 4.0 + 1.0*math.sin(2*math.pi*tsec/86400)  # m/s
         # اتجاه جنوب-شرق (u موجب شرقًا، v موجب شمالًا) → من الجنوب الشرقي للغرب والشمال؟ لنبسّط:
@@ -154,45 +207,71 @@ class SyntheticFields:
         direction_rad = math.radians(60.0)
         u = speed*math.cos(direction_rad)
         v = speed*math.sin(direction_rad)
-        return (u, v)
+        if np.ndim(lat) == 0:
+            return (u, v)
+        # الحقل منتظم مكانيًا → بثّ القيمة على شكل المصفوفة
+        shape, dtype = np.shape(lat), np.asarray(lat).dtype
+        return (np.full(shape, u, dtype=dtype), np.full(shape, v, dtype=dtype))
 
 SYN = SyntheticFields()
 
+# ========================= نواة Numba للحقول الاصطناعية =========================
+# نفس معادلات SyntheticFields لكن مدمجة مع التأفق والتشتت والقص في حلقة prange واحدة
+# طبقة خيوط workqueue في Numba لا تسمح باستدعاء نواة parallel من عدة خيوط في آنٍ واحد
+# (تُنهي العملية)، وخيوط Flask تستدعي _step بالتوازي → نسلسل الاستدعاءات بقفل
+_STEP_LOCK = threading.Lock()
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _syn_uv(lat, lon, tsec, lat_min, lat_max, lon_min, lon_max):
+        ly = (lat - lat_min)/(lat_max - lat_min + 1e-9)
+        lx = (lon - lon_min)/(lon_max - lon_min + 1e-9)
+        base = 0.25
+        uc = base*( math.sin(2*math.pi*lx) * math.cos(2*math.pi*ly) ) * (1+0.1*math.sin(2*math.pi*tsec/86400))
+        vc = base*( -math.cos(2*math.pi*lx) * math.sin(2*math.pi*ly) ) * (1+0.1*math.cos(2*math.pi*tsec/86400))
+        uc += 0.05*math.cos(2*math.pi*ly)
+        speed = 4.0 + 1.0*math.sin(2*math.pi*tsec/86400)
+        direction_rad = math.radians(60.0)
+        uw = speed*math.cos(direction_rad)
+        vw = speed*math.sin(direction_rad)
+        return uc, vc, uw, vw
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _step(lat, lon, tsec, dt, windage, sigma, dom_bounds, rand_x, rand_y):
+        """
+        خطوة RK2 (نقطة المنتصف) واحدة لكل الجسيمات (in-place على lat/lon).
+        dom_bounds = (lat_min, lat_max, lon_min, lon_max)
+        rand_x/rand_y: عيّنات normal(0,1) يولّدها المستدعي بـ numpy
+        """
+        lat_min, lat_max = dom_bounds[0], dom_bounds[1]
+        lon_min, lon_max = dom_bounds[2], dom_bounds[3]
+        for i in prange(lat.shape[0]):
+            uc, vc, uw, vw = _syn_uv(lat[i], lon[i], tsec, lat_min, lat_max, lon_min, lon_max)
+            # نصف خطوة تجريبية ثم السرعة عند المنتصف
+            lat_h = min(max(lat[i] + (vc + windage*vw)*0.5*dt*_INV_MDEGLAT, lat_min), lat_max)
+            lon_h = min(max(lon[i] + (uc + windage*uw)*0.5*dt*_INV_MDEGLON, lon_min), lon_max)
+            uc, vc, uw, vw = _syn_uv(lat_h, lon_h, tsec + 0.5*dt, lat_min, lat_max, lon_min, lon_max)
+            u = uc + windage*uw
+            v = vc + windage*vw
+            lon[i] += (u*dt + sigma*rand_x[i]) * _INV_MDEGLON
+            lat[i] += (v*dt + sigma*rand_y[i]) * _INV_MDEGLAT
+            lat[i] = min(max(lat[i], lat_min), lat_max)
+            lon[i] = min(max(lon[i], lon_min), lon_max)
+else:
+    _step = None
+
 # ========================= استيفاء حقول xarray (إن توفرت) =========================
-def bilinear_interpolate(arr2d, x, y):
-    """
-    arr2d: مصفوفة shape (ny, nx)
-    x,y: إحداثيات float (مؤشر داخل الشبكة)
-    يعيد قيمة ثنائية الخطيّة.
+def interp_grid(grid, arr2d, lat, lon):
     """
-    x0 = int(np.floor(x)); x1 = x0 + 1
-    y0 = int(np.floor(y)); y1 = y0 + 1
-    x0 = clamp(x0, 0, arr2d.shape[1]-1); x1 = clamp(x1, 0, arr2d.shape[1]-1)
-    y0 = clamp(y0, 0, arr2d.shape[0]-1); y1 = clamp(y1, 0, arr2d.shape[0]-1)
-    q11 = arr2d[y0, x0]; q21 = arr2d[y0, x1]
-    q12 = arr2d[y1, x0]; q22 = arr2d[y1, x1]
-    dx = x - x0; dy = y - y0
-    return (q11*(1-dx)*(1-dy) + q21*dx*(1-dy) + q12*(1-dx)*dy + q22*dx*dy)
-
-def sample_from_dataset(ds, varname, lat, lon, tindex) -> float:
+    grid: (lats, lons) محاور الشبكة المنتظمة (تصاعدية)
+    arr2d: مصفوفة shape (len(lats), len(lons))
+    lat, lon: قيمة مفردة أو مصفوفات نقاط (كل الجسيمات)
+    استيفاء ثنائي الخطيّة دفعةً واحدة عبر interpn؛ خارج الشبكة → 0.0
+    يعيد float32 مثل الشرائح المخزّنة في FieldProvider.prepare
     """
-    ds: xarray Dataset
-    varname: اسم المتغيّر (u, v, u10, v10)
-    يفترض أن ds[varname] أبعاده (time, lat, lon) بالترتيب.
-    """
-    v = ds[varname].isel(time=tindex)
-    lats = ds["lat"].values
-    lons = ds["lon"].values
-    # افترض lat تصاعدي و lon تصاعدي
-    iy = np.searchsorted(lats, lat) - 1
-    ix = np.searchsorted(lons, lon) - 1
-    iy = clamp(iy, 0, len(lats)-2)
-    ix = clamp(ix, 0, len(lons)-2)
-    # اصنع x,y نسبية داخل الخلية
-    x = ix + (lon - lons[ix]) / max(lons[ix+1] - lons[ix], 1e-9)
-    y = iy + (lat - lats[iy]) / max(lats[iy+1] - lats[iy], 1e-9)
-    arr2d = v.values  # (lat, lon)
-    return float(bilinear_interpolate(arr2d, x, y))
+    pts = np.stack([np.ravel(lat), np.ravel(lon)], -1)
+    out = interpn(grid, arr2d, pts, method="linear", bounds_error=False, fill_value=0.0)
+    return out.reshape(np.shape(lat)).astype(np.float32, copy=False)
 
 class FieldProvider:
     """
@@ -205,23 +284,63 @@ class FieldProvider:
         # إذا datasets موجودة، جهّز فهارس زمنيّة
         self.tidx_ecco = 0
         self.tidx_merra = 0
+        self._prepared = None
+        self.prepare()
+
+    def prepare(self):
+        """
+        يستخرج شرائح الزمن التي يلمسها التشغيل (tidx_ecco / tidx_merra) مع المحاور
+        إلى مصفوفات float32 متصلة مرة واحدة، فلا يدخل xarray في الحلقة الساخنة.
+        الاستدعاء المتكرر بنفس الفهارس لا يفعل شيئًا.
+        """
+        key = (self.tidx_ecco, self.tidx_merra)
+        if self._prepared == key:
+            return
+        def f32(a): return np.ascontiguousarray(a, dtype=np.float32)
+        if self.ds_ecco is not None:
+            ds = self.ds_ecco
+            self._grid_ecco = (f32(ds["lat"].values), f32(ds["lon"].values))
+            self._u = f32(ds["u"].isel(time=self.tidx_ecco).values)
+            self._v = f32(ds["v"].isel(time=self.tidx_ecco).values)
+        if self.ds_merra is not None:
+            ds = self.ds_merra
+            self._grid_merra = (f32(ds["lat"].values), f32(ds["lon"].values))
+            self._u10 = f32(ds["u10"].isel(time=self.tidx_merra).values)
+            self._v10 = f32(ds["v10"].isel(time=self.tidx_merra).values)
+        self._prepared = key
+
+    def is_synthetic(self) -> bool:
+        """True إن كانت كل الحقول من SyntheticFields (لا ECCO ولا MERRA)."""
+        return self.ds_ecco is None and self.ds_merra is None
+
+    def current_uv_batch(self, lat_arr, lon_arr):
+        u = interp_grid(self._grid_ecco, self._u, lat_arr, lon_arr)
+        v = interp_grid(self._grid_ecco, self._v, lat_arr, lon_arr)
+        return (u, v)
 
-    def current_uv(self, lat, lon, tsec) -> Tuple[float,float]:
+    def wind10m_uv_batch(self, lat_arr, lon_arr):
+        u = interp_grid(self._grid_merra, self._u10, lat_arr, lon_arr)
+        v = interp_grid(self._grid_merra, self._v10, lat_arr, lon_arr)
+        return (u, v)
+
+    def current_uv(self, lat, lon, tsec):
         if self.ds_ecco is not None:
             # نأخذ أول وقت متاح (أو استخدم near-time لاحقاً)
             try:
-                u = sample_from_dataset(self.ds_ecco, "u", lat, lon, self.tidx_ecco)
-                v = sample_from_dataset(self.ds_ecco, "v", lat, lon, self.tidx_ecco)
+                u, v = self.current_uv_batch(lat, lon)
+                if np.ndim(u) == 0:
+                    return (float(u), float(v))
                 return (u, v)
             except Exception:
                 pass
         return SYN.uv_current(lat, lon, tsec)
 
-    def wind10m_uv(self, lat, lon, tsec) -> Tuple[float,float]:
+    def wind10m_uv(self, lat, lon, tsec):
         if self.ds_merra is not None:
             try:
-                u = sample_from_dataset(self.ds_merra, "u10", lat, lon, self.tidx_merra)
-                v = sample_from_dataset(self.ds_merra, "v10", lat, lon, self.tidx_merra)
+                u, v = self.wind10m_uv_batch(lat, lon)
+                if np.ndim(u) == 0:
+                    return (float(u), float(v))
                 return (u, v)
             except Exception:
                 pass
@@ -230,80 +349,185 @@ class FieldProvider:
 FIELDS = FieldProvider()
 
 # ========================= محرك المحاكاة =========================
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+def _pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            # spawn وليس fork: السيرفر متعدد الخيوط، و fork بعد بدء الخيوط غير آمن
+            _POOL = ProcessPoolExecutor(max_workers=SIM_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _POOL
+
+def _reset_pool(broken):
+    """يتخلّص من مجمّع معطوب (مات أحد عمّاله) ليُنشأ مجمّع جديد في الطلب التالي."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is broken:
+            _POOL = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def _run_chunk(lat0, lon0, hours, n, windage, diff_m2s, backward, seed, use_jit, dt_seconds,
+               keep_state=True):
+    """
+    يشغّل حلقة الزمن (RK2 بخطوة dt_seconds) لمجموعة من n جسيمًا مستقلة.
+    يعيد (mean_track_arr بشكل (samples, 2) كـ (lon,lat)، lon، lat) للجسيمات؛
+    lon/lat تكون None إن keep_state=False (لا داعي لنقلها بين العمليات).
+    """
+    rng = seed_rng(seed)
+
+    # تهيئة الجسيمات حول النقطة (تشتت ابتدائي ~ 100م)
+    # الحالة float32 تنصّف عرض النطاق الترددي للذاكرة؛ دقة التمثيل ~0.4م لكل قيمة
+    # (المسافة بين قيم float32 قرب lon≈58° هي 2^-18° ≈ 3.8e-6°). خطأ التقريب يتراكم مع
+    # عدد الخطوات: dt_seconds الصغير جدًا يضيف انحرافًا ملحوظًا (~135م عند dt=60ث لمدة 48س)
+    lat = np.full((n,), lat0, dtype=np.float32) + rng.normal(0.0, 0.001, size=n).astype(np.float32)
+    lon = np.full((n,), lon0, dtype=np.float32) + rng.normal(0.0, 0.001, size=n).astype(np.float32)
+
+    steps = int(abs(hours*3600/dt_seconds))
+    dt_sec = -dt_seconds if backward else dt_seconds
+
+    # متوسط الجسيمات بعد كل خطوة (الصف 0 = البداية)، محجوز مسبقًا؛ يُعاد أخذ عيّناته
+    # في النهاية على فواصل TRACK_SAMPLE_SECONDS الثابتة مهما كان dt_seconds
+    step_means = np.empty((steps+1, 2))
+    step_means[0, 0] = lon.mean(dtype=np.float64)
+    step_means[0, 1] = lat.mean(dtype=np.float64)
+
+    dom_bounds = np.array([DOMAIN["lat_min"], DOMAIN["lat_max"],
+                           DOMAIN["lon_min"], DOMAIN["lon_max"]])
+
+    # خطوة عشوائية (Random Walk) لتقليد التشتت (diffusion)
+    # σ = sqrt(2*D*dt) ثابتة طوال التشغيل → نولّد عيّنات normal(0,1) دفعات
+    # من RNG_BLOCK_STEPS خطوة (شكل (block, 2, n)) بدل استدعاءين لكل خطوة
+    sigma = math.sqrt(max(2.0*diff_m2s*abs(dt_sec), 1e-12))
+    # المخازن محجوزة مرة واحدة ويُعاد ملؤها (out=) فلا تخصيص للذاكرة داخل الحلقة
+    noise = np.empty((min(RNG_BLOCK_STEPS, steps), 2, n), dtype=np.float32)
+    dx_rand = np.empty(n, dtype=np.float32)   # بالمتر شرق/غرب
+    dy_rand = np.empty_like(dx_rand)          # بالمتر شمال/جنوب
+    tmp = np.empty_like(dx_rand)              # إزاحة الخطوة (درجات)
+    lat_h = np.empty_like(dx_rand)            # موضع منتصف الخطوة (RK2)
+    lon_h = np.empty_like(dx_rand)
+
+    t0 = 0.0  # يمكن استخدام وقت فعلي إن رغبت
+    for k in range(steps):
+        tsec = t0 + k*dt_sec
+
+        b = k % RNG_BLOCK_STEPS
+        if b == 0:
+            rng.standard_normal(dtype=np.float32, out=noise[:min(RNG_BLOCK_STEPS, steps-k)])
+        rand_x = noise[b, 0]
+        rand_y = noise[b, 1]
+
+        if use_jit:
+            with _STEP_LOCK:
+                _step(lat, lon, tsec, dt_sec, windage, sigma, dom_bounds, rand_x, rand_y)
+        else:
+            # استخرج الحقول لكل الجسيمات دفعة واحدة (متجهيًا)
+            u_c, v_c = FIELDS.current_uv(lat, lon, tsec)
+            u_w, v_w = FIELDS.wind10m_uv(lat, lon, tsec)
+
+            # RK2 (نقطة المنتصف): نصف خطوة تجريبية بلا تشتت، ثم الحقول عند المنتصف
+            np.multiply(u_w, windage, out=tmp); np.add(tmp, u_c, out=tmp)
+            np.multiply(tmp, 0.5*dt_sec*_INV_MDEGLON, out=tmp); np.add(lon, tmp, out=lon_h)
+            np.multiply(v_w, windage, out=tmp); np.add(tmp, v_c, out=tmp)
+            np.multiply(tmp, 0.5*dt_sec*_INV_MDEGLAT, out=tmp); np.add(lat, tmp, out=lat_h)
+            np.clip(lat_h, DOMAIN["lat_min"], DOMAIN["lat_max"], out=lat_h)
+            np.clip(lon_h, DOMAIN["lon_min"], DOMAIN["lon_max"], out=lon_h)
+            u_c, v_c = FIELDS.current_uv(lat_h, lon_h, tsec + 0.5*dt_sec)
+            u_w, v_w = FIELDS.wind10m_uv(lat_h, lon_h, tsec + 0.5*dt_sec)
+
+            np.multiply(rand_x, sigma, out=dx_rand)
+            np.multiply(rand_y, sigma, out=dy_rand)
+
+            # حدّث المواقع (بالدرجات) في المكان عبر tmp بدون مصفوفات مؤقتة:
+            # lon += ((u_c + windage*u_w)*dt + dx_rand) * _INV_MDEGLON
+            # ملاحظة: u (شرق+) يعادل dx/dt بالمتر/ثانية
+            np.multiply(u_w, windage, out=tmp); np.add(tmp, u_c, out=tmp)
+            np.multiply(tmp, dt_sec, out=tmp); np.add(tmp, dx_rand, out=tmp)
+            np.multiply(tmp, _INV_MDEGLON, out=tmp); np.add(lon, tmp, out=lon)
+            # lat += ((v_c + windage*v_w)*dt + dy_rand) * _INV_MDEGLAT
+            np.multiply(v_w, windage, out=tmp); np.add(tmp, v_c, out=tmp)
+            np.multiply(tmp, dt_sec, out=tmp); np.add(tmp, dy_rand, out=tmp)
+            np.multiply(tmp, _INV_MDEGLAT, out=tmp); np.add(lat, tmp, out=lat)
+
+            # إبقِ الجسيمات ضمن الدومين بشكل لطيف (قص)
+            np.clip(lat, DOMAIN["lat_min"], DOMAIN["lat_max"], out=lat)
+            np.clip(lon, DOMAIN["lon_min"], DOMAIN["lon_max"], out=lon)
+
+        step_means[k+1, 0] = lon.mean(dtype=np.float64)
+        step_means[k+1, 1] = lat.mean(dtype=np.float64)
+
+    # استيفاء خطي على زمن ثابت؛ إن كان dt يقسم TRACK_SAMPLE_SECONDS فالنقاط هي متوسطات الخطوات نفسها
+    t_steps = dt_seconds*np.arange(steps+1)
+    n_samples = int(steps*dt_seconds/TRACK_SAMPLE_SECONDS + 1e-9)
+    t_samples = TRACK_SAMPLE_SECONDS*np.arange(1, n_samples+1)
+    mean_track_arr = np.column_stack([np.interp(t_samples, t_steps, step_means[:, 0]),
+                                      np.interp(t_samples, t_steps, step_means[:, 1])])
+
+    if not keep_state:
+        return mean_track_arr, None, None
+    return mean_track_arr, lon, lat
+
 def simulate_particles(lat0, lon0, hours=DEFAULT_HOURS, n=DEFAULT_PARTICLES,
                        windage=0.02, diff_m2s=0.5, backward=False,
-                       seed=None) -> Dict[str, Any]:
+                       seed=None, return_cloud=False, dt_seconds=None) -> Dict[str, Any]:
     """
     محاكاة Lagrangian بسيطة:
     - نطلق n جسيمًا حول نقطة (lat0,lon0) بتشتّت ابتدائي صغير
     - كل خطوة dt: x += (u_curr + windage*u_wind)*dt + random_walk
+      مع السرعة مأخوذة عند منتصف الخطوة (RK2)
+    - dt_seconds (> 0): افتراضيًا SYNTHETIC_DT_SECONDS للحقول الاصطناعية و DT_SECONDS لبيانات ناسا؛
+      الاتجاه يحدده backward فقط. المسار المتوسط يُعاد كل TRACK_SAMPLE_SECONDS
     - random_walk (m) يحوّل إلى درجات lat/lon (تقريب)
     - إن backward=True: dt ← -dt
+    - الجسيمات مستقلة: بدون Numba تُقسَّم على SIM_WORKERS عملية (_run_chunk)
+      ويُدمج المسار المتوسط بمتوسط موزون بحجم كل مجموعة؛ كل مجموعة تأخذ تيارًا عشوائيًا
+      مستقلًا من SeedSequence(seed).spawn
     يعاد:
       - "mean_track": polyline (lon,lat) لمتوسط الجسيمات عبر الزمن
-      - "final_cloud": سحابة نقاط أخيرة للجسيمات
+      - "final_cloud": سحابة نقاط أخيرة للجسيمات (فقط إن return_cloud=True)
     """
-    rng = seed_rng(seed)
-
-    # تهيئة الجسيمات حول النقطة (تشتت ابتدائي ~ 100م)
-    lat = np.full((n,), lat0, dtype=float) + rng.normal(0.0, 0.001, size=n)
-    lon = np.full((n,), lon0, dtype=float) + rng.normal(0.0, 0.001, size=n)
-
-    steps = int(abs(hours*3600/DT_SECONDS))
-    dt_sec = -DT_SECONDS if backward else DT_SECONDS
-
-    mean_track: List[Tuple[float,float]] = []
-    # ثوابت تحويل تقريبية من متر إلى درجة
-    meters_per_deg_lat = 111_000.0
-    def meters_to_deg_lat(d): return d/meters_per_deg_lat
-    def meters_to_deg_lon(d, lat_): return d/(meters_per_deg_lat*math.cos(math.radians(lat_))+1e-9)
-
-    sample_accum = 0
-    t0 = 0.0  # يمكن استخدام وقت فعلي إن رغبت
-    for k in range(steps):
-        tsec = t0 + k*dt_sec
-
-        # استخرج الحقول لكل جسيم (يمكن تسريعها بالتجميع)
-        u_c = np.zeros(n); v_c = np.zeros(n)
-        u_w = np.zeros(n); v_w = np.zeros(n)
-        for i in range(n):
-            uc, vc = FIELDS.current_uv(lat[i], lon[i], tsec)
-            uw, vw = FIELDS.wind10m_uv(lat[i], lon[i], tsec)
-            u_c[i] = uc; v_c[i] = vc
-            u_w[i] = uw; v_w[i] = vw
-
-        # السرعات الكلية (م/ث)
-        u = u_c + windage*u_w
-        v = v_c + windage*v_w
-
-        # خطوة عشوائية (Random Walk) لتقليد التشتت (diffusion)
-        # σ = sqrt(2*D*dt)
-        sigma = math.sqrt(max(2.0*diff_m2s*abs(dt_sec), 1e-12))
-        dx_rand = rng.normal(0.0, sigma, size=n)   # بالمتر شرق/غرب
-        dy_rand = rng.normal(0.0, sigma, size=n)   # بالمتر شمال/جنوب
-
-        # حدّث المواقع (بالدرجات)
-        # ملاحظة: u (شرق+) يعادل dx/dt بالمتر/ثانية
-        lon += meters_to_deg_lon(u*dt_sec + dx_rand, lat)
-        lat += meters_to_deg_lat(v*dt_sec + dy_rand)
-
-        # إبقِ الجسيمات ضمن الدومين بشكل لطيف (قص)
-        lat = np.clip(lat, DOMAIN["lat_min"], DOMAIN["lat_max"])
-        lon = np.clip(lon, DOMAIN["lon_min"], DOMAIN["lon_max"])
-
-        # خزّن المسار المتوسط كل عدة خطوات لتخفيف الحجم
-        sample_accum += 1
-        if sample_accum >= SAMPLE_EVERY_STEPS:
-            sample_accum = 0
-            mean_track.append((float(np.mean(lon)), float(np.mean(lat))))
-
-    if not mean_track:
-        mean_track = [(lon0, lat0)]
+    # جهّز شرائح الحقول (float32) قبل الحلقة
+    FIELDS.prepare()
+
+    # إن كانت الحقول اصطناعية و Numba متاح → النواة المترجمة (_step، متوازية عبر prange)
+    use_jit = _step is not None and FIELDS.is_synthetic()
+    if dt_seconds is None:
+        dt_seconds = SYNTHETIC_DT_SECONDS if FIELDS.is_synthetic() else DT_SECONDS
+    if not dt_seconds > 0:
+        raise ValueError("dt_seconds must be > 0")
+    workers = 1 if use_jit else min(SIM_WORKERS, n // MIN_PARTICLES_PER_WORKER)
+
+    if workers <= 1:
+        mean_track_arr, lon, lat = _run_chunk(lat0, lon0, hours, n, windage, diff_m2s,
+                                              backward, seed, use_jit, dt_seconds, return_cloud)
+    else:
+        sizes = [n//workers + (1 if i < n % workers else 0) for i in range(workers)]
+        seeds = np.random.SeedSequence(seed).spawn(workers)
+        chunks = [(lat0, lon0, hours, m, windage, diff_m2s, backward,
+                   ss, False, dt_seconds, return_cloud)
+                  for m, ss in zip(sizes, seeds)]
+        pool = _pool()
+        try:
+            futures = [pool.submit(_run_chunk, *c) for c in chunks]
+            parts = [f.result() for f in futures]
+        except BrokenProcessPool:
+            # مات أحد العمّال: أعِد ضبط المجمّع ونفّذ المجموعات في هذه العملية
+            _reset_pool(pool)
+            parts = [_run_chunk(*c) for c in chunks]
+        mean_track_arr = sum(m*p[0] for m, p in zip(sizes, parts)) / n
+        if return_cloud:
+            lon = np.concatenate([p[1] for p in parts])
+            lat = np.concatenate([p[2] for p in parts])
+
+    mean_track = mean_track_arr.tolist() if len(mean_track_arr) else [[lon0, lat0]]
 
     result = {
         "mean_track": mean_track,  # [(lon,lat), ...]
-        "final_cloud": list(zip(lon.tolist(), lat.tolist()))
     }
+    if return_cloud:
+        result["final_cloud"] = np.column_stack([lon, lat]).tolist()
     return result
 
 def to_geojson_linestring(coords: List[Tuple[float,float]]) -> Dict[str, Any]:
@@ -331,6 +555,15 @@ def synth_status(turbidity, ph, ec):
     if turbidity>7.5 or ph>8.5 or ec>36: return "WARNING"
     return "OK"
 
+def synth_status_batch(tb, ph, ec):
+    """
+    نفس قواعد synth_status لكن لمصفوفات قراءات كاملة بأقنعة مقارنة (بدون تفرّع لكل صف).
+    """
+    tb, ph, ec = np.asarray(tb), np.asarray(ph), np.asarray(ec)
+    alert = (tb>10) | (ph>9) | (ec>40)
+    warn = ~alert & ((tb>7.5) | (ph>8.5) | (ec>36))
+    return np.where(alert, "ALERT", np.where(warn, "WARNING", "OK"))
+
 def latest_data():
     now = dt.datetime.utcnow()
     rows = []
@@ -339,13 +572,15 @@ def latest_data():
         ("B2", 23.70, 58.70, 8.2, 8.1, 36),
         ("B3", 23.80, 58.90, 12.0, 9.2, 42),
     ]
-    for did, la, lo, tb, ph, ec in base:
+    # صنّف كل القراءات دفعة واحدة
+    statuses = synth_status_batch([r[3] for r in base], [r[4] for r in base], [r[5] for r in base])
+    for (did, la, lo, tb, ph, ec), status in zip(base, statuses.tolist()):
         rows.append({
             "time": now.strftime("%Y-%m-%d %H:%M"),
             "device_id": did,
             "lat": la, "lon": lo,
             "turbidity": tb, "ph": ph, "ec": ec,
-            "status": synth_status(tb, ph, ec)
+            "status": status
         })
     return rows
 
@@ -383,23 +618,40 @@ def api_trajectory():
     # الواجهة تتوقع [lat,lon] لذا نعيد بنفس الترتيب:
     return jsonify([[lat,lon] for (lat,lon) in path])
 
-@app.route("/currents")
-def api_currents():
+def _build_currents_payload(tsec=0.0):
     """
-    نعيد عيّنة أسهم تيار للخريطة (lat,lon,u,v).
+    عيّنة أسهم تيار للخريطة (lat,lon,u,v) على شبكة 8×10 داخل الدومين.
     """
     out = []
     rows = 8; cols = 10
-    tsec = 0.0
     for iy in range(rows):
         lat = DOMAIN["lat_min"] + (iy+0.5)*(DOMAIN["lat_max"]-DOMAIN["lat_min"])/rows
         for ix in range(cols):
             lon = DOMAIN["lon_min"] + (ix+0.5)*(DOMAIN["lon_max"]-DOMAIN["lon_min"])/cols
             u,v = FIELDS.current_uv(lat, lon, tsec)
             out.append({"lat":lat,"lon":lon,"u":u,"v":v})
-    return jsonify(out)
+    return out
+
+# الشبكة والزمن ثابتان → النتيجة حتمية، تُحسب مرة واحدة عند الاستيراد
+# (إن أصبحت تعتمد على الزمن لاحقًا: اجعل المفتاح int(tsec // 3600))
+_CURRENTS_CACHE = _build_currents_payload()
+
+@app.route("/currents")
+def api_currents():
+    """
+    نعيد عيّنة أسهم تيار للخريطة (lat,lon,u,v).
+    """
+    return jsonify(_CURRENTS_CACHE)
 
 # ---- محاكاة التقديم/الإرجاع ----
+def fast_json(obj):
+    """
+    مثل jsonify لكن عبر orjson (إن توفر) — أسرع بكثير مع قوائم الإحداثيات الطويلة.
+    """
+    if orjson is None:
+        return jsonify(obj)
+    return Response(orjson.dumps(obj), mimetype="application/json")
+
 def parse_float(qs, key, default):
     try: return float(qs.get(key, default))
     except: return default
@@ -418,9 +670,10 @@ def api_forward():
     wind = parse_float(args,"windage", 0.02)
     diff = parse_float(args,"diff", 0.5)
 
-    sim = simulate_particles(lat, lon, hours=hrs, n=n, windage=wind, diff_m2s=diff, backward=False)
+    sim = simulate_particles(lat, lon, hours=hrs, n=n, windage=wind, diff_m2s=diff, backward=False,
+                             return_cloud=False)
     # الواجهة تستخدم GeoJSON LineString (lon,lat)
-    return jsonify(to_geojson_linestring(sim["mean_track"]))
+    return fast_json(to_geojson_linestring(sim["mean_track"]))
 
 @app.route("/simulate/backward")
 def api_backward():
@@ -432,8 +685,9 @@ def api_backward():
     wind = parse_float(args,"windage", 0.02)
     diff = parse_float(args,"diff", 0.5)
 
-    sim = simulate_particles(lat, lon, hours=hrs, n=n, windage=wind, diff_m2s=diff, backward=True)
-    return jsonify(to_geojson_linestring(sim["mean_track"]))
+    sim = simulate_particles(lat, lon, hours=hrs, n=n, windage=wind, diff_m2s=diff, backward=True,
+                             return_cloud=False)
+    return fast_json(to_geojson_linestring(sim["mean_track"]))
 
 # ========================= تشغيل =========================
 if __name__ == "__main__":
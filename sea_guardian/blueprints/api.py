@@ -1,6 +1,10 @@
 from __future__ import annotations
+import math
+import time
 from flask import Blueprint, request, jsonify, abort
 from datetime import datetime
+import numpy as np
+from scipy.spatial import cKDTree
 from .. import db
 from ..models import Buoy, SensorReading, EventLog, LeakIncident, LeakVolume, TrajectoryPoint
 
@@ -29,18 +33,26 @@ def buoys_create():
         )
     except KeyError as e:
         abort(400, f"missing field: {e.args[0]}")
+    if not (math.isfinite(b.lat) and math.isfinite(b.lon)):
+        abort(400, "lat/lon must be finite numbers")
     db.session.add(b)
     db.session.commit()
+    _invalidate_buoy_tree()  # new buoy → rebuild nearest-buoy tree
     return {"ok": True, "id": b.id}, 201
 
 @api_bp.get("/buoys/<int:buoy_id>")
 def buoy_detail(buoy_id):
     b = Buoy.query.get_or_404(buoy_id)
-    readings = (SensorReading.query
-                .filter_by(buoy_id=b.id)
-                .order_by(SensorReading.recorded_at.desc())
-                .limit(200)
-                .all())
+    # plain column rows (no ORM instances) — this endpoint is read-only
+    readings = db.session.execute(
+        db.select(SensorReading.id, SensorReading.recorded_at,
+                  SensorReading.turbidity, SensorReading.ph, SensorReading.ec,
+                  SensorReading.temperature, SensorReading.lat, SensorReading.lon,
+                  SensorReading.status)
+        .where(SensorReading.buoy_id == b.id)
+        .order_by(SensorReading.recorded_at.desc())
+        .limit(200)
+    ).all()
     return {
         "id": b.id, "device_id": b.device_id, "name": b.name, "lat": b.lat, "lon": b.lon,
         "readings": [{
@@ -97,11 +109,37 @@ def _volume_params(volume: LeakVolume):
         return 50.0, 10000.0, 8.0
     return 80.0, 20000.0, 12.0  # LARGE
 
-def _find_nearest_buoy(lat: float, lon: float) -> Buoy | None:
-    """Rough nearest by Euclidean distance in degrees (fast and good enough here)."""
-    return (Buoy.query
-            .order_by((Buoy.lat - lat)*(Buoy.lat - lat) + (Buoy.lon - lon)*(Buoy.lon - lon))
-            .first())
+# In-process KD-tree over buoy (lat, lon) for nearest-buoy lookups. Rebuilt after a buoy is
+# created here, and at least every _BUOY_TREE_TTL seconds to pick up changes made elsewhere.
+_BUOY_TREE_TTL = 60.0
+# (built_at, ids, tree) or None; replaced as a whole so concurrent readers never see a mix
+_BUOY_TREE = None
+
+def _invalidate_buoy_tree() -> None:
+    global _BUOY_TREE
+    _BUOY_TREE = None
+
+def _rebuild_tree() -> tuple:
+    global _BUOY_TREE
+    rows = db.session.query(Buoy.id, Buoy.lat, Buoy.lon).order_by(Buoy.id).all()
+    # rows stored before coordinates were validated may hold NaN/inf; cKDTree rejects those
+    rows = [r for r in rows if math.isfinite(r[1]) and math.isfinite(r[2])]
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    tree = cKDTree([(r[1], r[2]) for r in rows]) if rows else None
+    state = (time.monotonic(), ids, tree)
+    _BUOY_TREE = state
+    return state
+
+def _find_nearest_buoy(lat: float, lon: float) -> int | None:
+    """Id of the rough nearest buoy by Euclidean distance in degrees (fast and good enough here)."""
+    state = _BUOY_TREE
+    if state is None or time.monotonic() - state[0] > _BUOY_TREE_TTL:
+        state = _rebuild_tree()
+    _, ids, tree = state
+    if tree is None:
+        return None
+    _, i = tree.query([lat, lon])
+    return int(ids[i])
 
 @api_bp.get("/leaks")
 def leaks_list():
@@ -127,6 +165,8 @@ def leaks_create():
         abort(400, f"Missing field: {e.args[0]}")
     except ValueError:
         abort(400, "lat/lon must be numbers")
+    if not (math.isfinite(lat) and math.isfinite(lon)):
+        abort(400, "lat/lon must be finite numbers")
 
     # 3️⃣ Resolve buoy association
     buoy_id = data.get("buoy_id")
@@ -134,8 +174,8 @@ def leaks_create():
     # Try to find nearest if not provided
     if not buoy_id:
         nearest = _find_nearest_buoy(lat, lon)
-        if nearest:
-            buoy_id = nearest.id
+        if nearest is not None:
+            buoy_id = nearest
         else:
             # Fallback to first buoy in DB (never NULL)
             default_buoy = Buoy.query.first()
@@ -204,6 +244,18 @@ def update_leak(leak_id):
     })
 
 
+def save_track(leak_id: int, coords, dt_seconds: float) -> int:
+    """Bulk-insert a [(lon, lat), ...] track for a leak with one Core INSERT (no ORM objects).
+
+    dt_seconds is the time between consecutive points (it depends on the simulation that
+    produced the track). The caller owns the transaction and commits.
+    """
+    rows = [{"leak_id": leak_id, "seq": i, "lat": la, "lon": lo, "t_offset_s": int(i * dt_seconds)}
+            for i, (lo, la) in enumerate(coords)]
+    if rows:
+        db.session.execute(TrajectoryPoint.__table__.insert(), rows)
+    return len(rows)
+
 @api_bp.get("/leaks/<int:leak_id>/track")
 def leak_track(leak_id: int):
     pts = (TrajectoryPoint.query
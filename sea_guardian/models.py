@@ -19,8 +19,10 @@ class Buoy(db.Model):
 
 class SensorReading(db.Model):
     __tablename__ = "sensor_readings"
+    # latest-N readings per buoy: walk the index in order and stop at LIMIT
+    __table_args__ = (db.Index("ix_reading_buoy_time", "buoy_id", "recorded_at"),)
     id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
-    buoy_id = db.Column(db.Integer, db.ForeignKey("buoys.id"), index=True, nullable=False)
+    buoy_id = db.Column(db.Integer, db.ForeignKey("buoys.id"), nullable=False)  # indexed by ix_reading_buoy_time
     recorded_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     turbidity = db.Column(db.Float)    # NTU
     ph = db.Column(db.Float)           # pH
@@ -64,8 +66,10 @@ class LeakIncident(db.Model):
 
 class TrajectoryPoint(db.Model):
     __tablename__ = "trajectory_points"
+    # a leak's track in seq order without a separate sort
+    __table_args__ = (db.Index("ix_traj_leak_seq", "leak_id", "seq"),)
     id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
-    leak_id = db.Column(db.BigInteger, db.ForeignKey("leak_incidents.id"), index=True, nullable=False)
+    leak_id = db.Column(db.BigInteger, db.ForeignKey("leak_incidents.id"), nullable=False)  # indexed by ix_traj_leak_seq
     seq = db.Column(db.Integer, index=True)          # order of the track
     lat = db.Column(db.Float, nullable=False)
     lon = db.Column(db.Float, nullable=False)